@@ -8,18 +8,22 @@ Batchable for expanding from countries to groups
 import logging
 import os
 from ast import literal_eval
+from datetime import datetime
 import boto3
 from urllib.parse import urlsplit
 
 from nesta.packages.meetup.country_groups import MeetupCountryGroups
-from nesta.packages.meetup.meetup_utils import flatten_data
-from nesta.core.orms.orm_utils import insert_data
+from nesta.packages.meetup.meetup_utils import normalize_data
+from nesta.core.orms.orm_utils import get_mysql_engine
+from nesta.core.orms.orm_utils import try_until_allowed
 from nesta.core.orms.meetup_orm import Base
 from nesta.core.orms.meetup_orm import Group
 from nesta.core.luigihacks.s3 import parse_s3_path
 
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import func
+from sqlalchemy import select
+
+CHUNKSIZE = 10000  # Rows per multi-row INSERT
+
 
 def run():
     logging.getLogger().setLevel(logging.INFO)
@@ -39,28 +43,39 @@ def run():
                               coords=coords,
                               radius=radius)
     mcg.get_groups_recursive()
-    output = flatten_data(mcg.groups,
-                          country_name=name,
-                          country=iso2,
-                          timestamp=func.utc_timestamp(),
-                          keys=[('category', 'name'),
-                                ('category', 'shortname'),
-                                ('category', 'id'),
-                                'description',
-                                'created',
-                                'country',
-                                'city',
-                                'id',
-                                'lat',
-                                'lon',
-                                'members',
-                                'name',
-                                'topics',
-                                'urlname'])
+    output = normalize_data(mcg.groups,
+                            country_name=name,
+                            country=iso2,
+                            timestamp=datetime.utcnow(),
+                            keys=[('category', 'name'),
+                                  ('category', 'shortname'),
+                                  ('category', 'id'),
+                                  'description',
+                                  'created',
+                                  'country',
+                                  'city',
+                                  'id',
+                                  'lat',
+                                  'lon',
+                                  'members',
+                                  'name',
+                                  'topics',
+                                  'urlname'])
+
+    # Exclude groups which already exist in the DB
+    engine = get_mysql_engine("BATCHPAR_config", "mysqldb", db)
+    try_until_allowed(Base.metadata.create_all, engine)
+    ids = [row['id'] for row in output]
+    with engine.connect() as conn:
+        query = select([Group.id]).where(Group.id.in_(ids))
+        existing_ids = set(id_ for id_, in conn.execute(query))
+    output = [row for row in output if row['id'] not in existing_ids]
 
-    # Add the data
-    objs = insert_data("BATCHPAR_config", "mysqldb", db,
-                       Base, Group, output)
+    # Add the data in bulk via SQL Alchemy Core (i.e. bypassing
+    # the ORM), in a single transaction
+    with engine.begin() as conn:
+        for i in range(0, len(output), CHUNKSIZE):
+            conn.execute(Group.__table__.insert(), output[i:i+CHUNKSIZE])
 
     # Mark the task as done
     s3 = boto3.resource('s3')
@@ -68,7 +83,7 @@ def run():
     s3_obj.put(Body="")
 
     # Mainly for testing
-    return len(objs)
+    return len(output)
 
 
 if __name__ == "__main__":
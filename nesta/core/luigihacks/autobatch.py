@@ -4,13 +4,19 @@ of AWS batch tasks; as a single Luigi Task.
 
 from abc import ABC
 from abc import abstractmethod
-from collections import defaultdict
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from nesta.core.luigihacks import batchclient
 from subprocess import check_output
 from subprocess import CalledProcessError
+import random
 import time
+import boto3
 import luigi
 from nesta.core.luigihacks.misctools import get_config
+import json
 import logging
 import os
 
@@ -18,23 +24,49 @@ import os
 # in order to give the Luigi worker some grace
 _config = get_config("luigi.cfg", "worker")
 
+# The bucket to which batchables (see core/scripts/nesta_prepare_batch)
+# and array job manifests are uploaded
+S3_BATCH_BUCKET = "nesta-batch"
+# The maximum number of child jobs in an AWS batch array job
+MAX_ARRAY_SIZE = 10000
+# Prefix for the environmental variables passed to the batch jobs
+BATCHPAR_PREFIX = "BATCHPAR_"
 
-def command_line(command, verbose=False):
+
+def command_line(argv, verbose=False):
     '''Execute command line tasks and return the final output line.
-    This is particularly useful for extracting the AWS access keys
-    directly from the OS; as well as executing the environment
+    This is particularly useful for executing the environment
     preparation script (:code:`core/scripts/nesta_prepare_batch.sh`).
+
+    Args:
+        argv (:obj:`list` of :obj:`str`): The program and its arguments,
+             which are executed directly (i.e. not via a shell).
+        verbose (bool): Log every line of the output.
     '''
     # Execute the command and decode the output
-    out = check_output([command], shell=True)
-    out_lines = out.decode("utf-8").split("\n")
-    if verbose:
-        for line in out_lines:
+    out = check_output(argv, shell=False)
+    text = out.decode("utf-8", errors="replace")
+    if verbose and logging.getLogger().isEnabledFor(logging.INFO):
+        for line in text.splitlines():
             logging.info(f"{os.getpid()}: "
                          ">>>\t'{}'".format(line.replace("\r", ' ')))
-    # The second last output is the actual final output
-    # (ignoring the status code, which is the last output)
-    return out_lines[-2]
+    # The final line is the actual final output
+    return text.rstrip("\n").rpartition("\n")[2]
+
+
+@lru_cache(maxsize=1)
+def _get_aws_credentials():
+    '''Retrieve the AWS credentials from the default boto3 session.
+    These are cached for the lifetime of the process, noting that
+    temporary credentials are refreshed by boto3 when they are
+    frozen (see :code:`execute`). An exception is raised (and so
+    nothing is cached) if no credentials are found.'''
+    credentials = boto3.Session().get_credentials()
+    if credentials is None:
+        raise batchclient.BatchJobException("No AWS credentials found, "
+                                            "which are required by the "
+                                            "batch jobs")
+    return credentials
 
 
 class AutoBatchTask(luigi.Task, ABC):
@@ -51,6 +83,24 @@ class AutoBatchTask(luigi.Task, ABC):
     :code:`prepare` method. The :code:`combine` method will subsequently
     combine the outputs from the batch task.
 
+    For CPU-bound preparation or combination, the following optional
+    methods may also be implemented, which are run in a pool of
+    :code:`prepare_workers` (or :code:`combine_workers`) processes, and
+    so their inputs and outputs must be picklable:
+
+    - :code:`prepare_shards(self)`: returns a :code:`list` of inputs
+      to :code:`prepare_one`.
+    - :code:`prepare_one(self, shard)`: returns the :code:`list` of
+      :code:`dict` for one shard, such that the concatenated outputs
+      are equivalent to :code:`prepare`.
+    - :code:`combine_shards(self, job_params)`: returns a :code:`list`
+      of inputs to :code:`combine_one`.
+    - :code:`combine_one(self, shard)`: returns the result for one shard.
+    - :code:`combine_results(self, job_params, results)`: receives the
+      results of :code:`combine_one`, in the order of
+      :code:`combine_shards`, and should finally write to the
+      :code:`luigi.Target` output.
+
     Args:
         batchable (str): Path to the directory containing the run.py batchable
         job_def (str): Name of the AWS job definition
@@ -65,12 +115,49 @@ class AutoBatchTask(luigi.Task, ABC):
               Defaults to 1.
         memory (int, optional): Memory to request for the AWS batch job.
                Defaults to 512 MiB.
-        max_runs (int, optional): Number of batch jobs to run, which is useful
-                 for testing a subset of the full pipeline, or making cost
+        max_runs (int, optional): Number of pending (i.e. not done) batch
+                 jobs to run, which is useful for testing a subset of the
+                 full pipeline, or making cost
                  predictions for AWS computing time. Defaults to `None`,
                  implying that all jobs should be run.
-        poll_time (int, optional): Time in seconds between querying the AWS
-                  batch job status. Defaults to 60.
+        poll_time (int, optional): Maximum time in seconds between querying
+                  the AWS batch job status. Defaults to 60.
+        min_poll_time (int, optional): Minimum time in seconds between
+                      querying the AWS batch job status. The time between
+                      queries is doubled (up to :code:`poll_time`) for
+                      every query in which no job finishes, and is reset
+                      to :code:`min_poll_time` otherwise. Defaults to 5.
+        event_queue_url (str, optional): URL of an SQS queue subscribed
+                        (via an EventBridge rule with event pattern
+                        :code:`{"source": ["aws.batch"], "detail-type":
+                        ["Batch Job State Change"], "detail": {"jobQueue":
+                        [<job queue ARN>], "status": ["SUCCEEDED",
+                        "FAILED"]}}`) to AWS batch job state changes.
+                        If specified, the time between status queries is
+                        spent long polling the queue, so that finished
+                        jobs are detected immediately and needn't be
+                        queried. The queue must be dedicated to this task,
+                        since every message received is deleted.
+                        Defaults to :obj:`None`.
+        array_job (bool, optional): Submit the jobs as AWS batch array jobs,
+                  rather than one job per parameter set, with the
+                  parameters for each child job read from a manifest on
+                  S3. Note that :code:`max_live_jobs` is ignored for
+                  array jobs, and that the job definition's image must
+                  support manifests (see the :code:`launch.sh` scripts in
+                  :code:`core/scripts/docker_recipes`). Defaults to False.
+        submit_workers (int, optional): Number of threads with which to
+                       concurrently submit AWS batch jobs. Defaults to 16.
+        prepare_workers (int, optional): Number of processes with which to
+                        run :code:`prepare_one` over :code:`prepare_shards`,
+                        if implemented, instead of :code:`prepare`.
+                        Defaults to 1, implying that :code:`prepare`
+                        is always used.
+        combine_workers (int, optional): Number of processes with which to
+                        run :code:`combine_one` over :code:`combine_shards`,
+                        followed by :code:`combine_results`, if implemented,
+                        instead of :code:`combine`. Defaults to 1, implying
+                        that :code:`combine` is always used.
         success_rate (float, optional): If the fraction of FAILED jobs exceeds
                      :code:`success_rate` then the entire Task, along with
                      any submitted AWS batch jobs, is killed. The fraction is
@@ -88,14 +175,21 @@ class AutoBatchTask(luigi.Task, ABC):
     max_runs = luigi.IntParameter(default=None)  # For testing
     timeout = luigi.IntParameter(default=21600)
     poll_time = luigi.IntParameter(default=60)
+    min_poll_time = luigi.IntParameter(default=5)
+    event_queue_url = luigi.OptionalParameter(default=None)
     success_rate = luigi.FloatParameter(default=0.95)
     test = luigi.BoolParameter(default=True)
     max_live_jobs = luigi.IntParameter(default=25)
+    submit_workers = luigi.IntParameter(default=16)
+    array_job = luigi.BoolParameter(default=False)
+    prepare_workers = luigi.IntParameter(default=1)
+    combine_workers = luigi.IntParameter(default=1)
     worker_timeout = float('inf')
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.failed_jobs = set()
+        self.event_statuses = {}  # Final statuses from the event queue
 
 
     def run(self):
@@ -111,29 +205,28 @@ class AutoBatchTask(luigi.Task, ABC):
         self.TIMEOUT = time.time() + int(_config["timeout"])
 
         # Generate the parameters for batches
-        job_params = self.prepare()
+        job_params = self._prepare()
         if self.test:
             if len(job_params) > 2:
                 job_params = job_params[0:2]
                 logging.info(f"Test mode ({pid}): running {len(job_params)} jobs")
 
         # Prepare the environment for batching
-        env_files = " ".join(self.env_files)
         try:
             if self.test:
                 logging.info(f"Test mode ({pid}): Preparing batch")
-            s3file_timestamp = command_line("nesta_prepare_batch "
-                                            "{} {}".format(self.batchable,
-                                                           env_files), self.test)
+            s3file_timestamp = command_line(["nesta_prepare_batch",
+                                             self.batchable, *self.env_files],
+                                            self.test)
             if self.test:
                 logging.info(f"Test mode ({pid}): Prepared batch")
-        except CalledProcessError:
+        except (CalledProcessError, FileNotFoundError):
             raise batchclient.BatchJobException("Invalid input "
                                                 "or environment files")
         # Execute batch jobs
         self.execute(job_params, s3file_timestamp)
         # Combine the outputs
-        self.combine(job_params)
+        self._combine(job_params)
 
     @abstractmethod
     def prepare(self):
@@ -165,10 +258,37 @@ class AutoBatchTask(luigi.Task, ABC):
         '''
         pass
 
+    def _implements(self, *methods):
+        '''Whether this class implements all of the given (optional) methods'''
+        return all(hasattr(self, method) for method in methods)
+
+    def _prepare(self):
+        '''Call :code:`prepare`, or :code:`prepare_one` in parallel
+        over :code:`prepare_shards` if implemented.'''
+        if self.prepare_workers <= 1 or not self._implements("prepare_shards",
+                                                               "prepare_one"):
+            return self.prepare()
+        with ProcessPoolExecutor(max_workers=self.prepare_workers) as executor:
+            outputs = executor.map(self.prepare_one, self.prepare_shards())
+            return [params for output in outputs for params in output]
+
+    def _combine(self, job_params):
+        '''Call :code:`combine`, or :code:`combine_one` in parallel
+        over :code:`combine_shards` followed by :code:`combine_results`
+        if implemented.'''
+        if self.combine_workers <= 1 or not self._implements("combine_shards",
+                                                               "combine_one",
+                                                               "combine_results"):
+            return self.combine(job_params)
+        with ProcessPoolExecutor(max_workers=self.combine_workers) as executor:
+            results = list(executor.map(self.combine_one,
+                                        self.combine_shards(job_params)))
+        self.combine_results(job_params, results)
+
     def execute(self, job_params, s3file_timestamp):
         ''' The secret sauce, which automatically submits and monitors
         the AWS batch jobs. Your AWS access key and id are automatically
-        retrieved via the AWS CLI.
+        retrieved via boto3.
 
         Parameters:
             job_params (:obj:`list` of :obj:`dict`): The batchable job
@@ -183,10 +303,8 @@ class AutoBatchTask(luigi.Task, ABC):
         '''
         pid = os.getpid()
         # Get AWS info to pass to the batch jobs
-        aws_id = command_line("aws --profile default configure "
-                              "get aws_access_key_id", self.test)
-        aws_secret = command_line("aws --profile default configure "
-                                  "get aws_secret_access_key", self.test)
+        credentials = _get_aws_credentials().get_frozen_credentials()
+        aws_id, aws_secret, aws_token = credentials
 
         # Build a set of environmental variables to send to the jobs
         env_variables = [{"name": "AWS_ACCESS_KEY_ID", "value": aws_id},
@@ -195,6 +313,10 @@ class AutoBatchTask(luigi.Task, ABC):
                          {"name": "BATCHPAR_S3FILE_TIMESTAMP",
                           "value": s3file_timestamp}]
                          #{"name": "PYTHONIOENCODING", "value": "latin1"}]
+        # Temporary (e.g. STS or SSO) credentials also require the token
+        if aws_token is not None:
+            env_variables.append({"name": "AWS_SESSION_TOKEN",
+                                  "value": aws_token})
 
         if self.test:
             logging.info(f"Test mode ({pid}): Got env variables")
@@ -202,26 +324,30 @@ class AutoBatchTask(luigi.Task, ABC):
         # Set up batch client, and check that we haven't 
         # already hit the time limit
         batch_client = batchclient.BatchClient(poll_time=self.poll_time,
+                                               max_pool_connections=self.submit_workers,
                                                region_name=self.region_name)
         self._assert_timeout(batch_client, job_ids=[])
         if self.test:
             logging.info(f"Test mode ({pid}): Ready to batch")
         
-        all_job_kwargs = []
-        for i, params in enumerate(job_params):
-            if params["done"]:
-                continue
-            # Break in case of testing
-            if (self.max_runs is not None) and (i >= self.max_runs):
-                break
+        # Only consider jobs which aren't done, truncated in case of testing
+        pending = [params for params in job_params
+                   if not params["done"]][:self.max_runs]
+        # Array jobs require at least two child jobs
+        if self.array_job and len(pending) > 1:
+            self._run_array_jobs(batch_client, env_variables,
+                                 pending, s3file_timestamp)
+            return
 
-            _env_variables = env_variables.copy()
-            for k, v in params.items():
-                new_row = dict(name="BATCHPAR_{}".format(k), value=str(v))
-                _env_variables.append(new_row)
+        overrides_template = {"memory": self.memory, "vcpus": self.vcpus}
+        all_job_kwargs = []
+        for params in pending:
+            # Note: strings are used as-is, rather than via str()
+            _env_variables = env_variables + [{"name": BATCHPAR_PREFIX + k,
+                                               "value": v if type(v) is str else str(v)}
+                                              for k, v in params.items()]
             # Add the environmental variables to the container overrides
-            overrides = dict(environment=_env_variables,
-                             memory=self.memory, vcpus=self.vcpus)
+            overrides = {"environment": _env_variables, **overrides_template}
             job_kwargs = dict(jobDefinition=self.job_def,
                               jobName=self.job_name,
                               jobQueue=self.job_queue,
@@ -233,77 +359,236 @@ class AutoBatchTask(luigi.Task, ABC):
         self._run_batch_jobs(batch_client, all_job_kwargs)
 
     def _run_batch_jobs(self, batch_client, all_job_kwargs):
-        '''Monitor AWS batch jobs until finished or failed.
+        '''Submit AWS batch jobs, in order and with no more than
+        :code:`max_live_jobs` live at once, and monitor them until
+        finished or failed.
 
         Parameters:
             batch_client (:obj:`BatchClient`)
-            job_ids (:obj:`list` of :obj:`str`): List of AWS batch
-                    job IDs to monitor.
+            all_job_kwargs (:obj:`list` of :obj:`dict`): The keyword
+                           arguments for submitting each job.
         '''
 
         # Keep submitting until all submitted
         all_job_ids = set()
-        done_job_ids = set()
-        submitted_job_idxs = set()
+        done_job_ids = {}  # Final status of each finished job
+        last_status = {}  # Latest known status of each job
+        running_stats = Counter()  # Number of jobs with each status
+        sleep = None
+        n_done_prev = 0
         logging.info(f"{os.getpid()}: "
                      "{} jobs to run".format(len(all_job_kwargs)))
-        while len(all_job_kwargs) > len(all_job_ids):
-            # Get the number of live jobs
-            running_job_ids = all_job_ids - done_job_ids
-            n_live = len(running_job_ids)
-            n_done = len(done_job_ids)
-            n_left = len(all_job_kwargs) - n_done - n_live
-            logging.info(f"{os.getpid()}: "
-                         "{} jobs are live, "
-                         "{} are finished, "
-                         "and {} are yet to be submitted".format(n_live, n_done, n_left))
-                                                 
-            if n_live > 1:
-                self._assert_timeout(batch_client, running_job_ids)
-                self._assert_success(batch_client, all_job_ids, done_job_ids)
-            # Submit some jobs until `self.max_live_jobs` reached
-            for ijob, job_kwargs in enumerate(all_job_kwargs):
-                if n_live >= self.max_live_jobs:
-                    break
-                if ijob in submitted_job_idxs:
-                    continue
-                # Submit a new job
-                id_ = batch_client.submit_job(**job_kwargs)
-                all_job_ids.add(id_)
-                submitted_job_idxs.add(ijob)
-                n_live += 1
-            # Wait before continuing
-            logging.info(f"{os.getpid()}: Not done submitting...")
-            time.sleep(self.poll_time)
+        with ThreadPoolExecutor(max_workers=self.submit_workers) as executor:
+            while len(all_job_kwargs) > len(all_job_ids):
+                running_job_ids = all_job_ids - done_job_ids.keys()
+                if len(running_job_ids) > 0:
+                    self._assert_timeout(batch_client, running_job_ids)
+                    self._assert_success(batch_client, all_job_ids, done_job_ids,
+                                         last_status, running_stats)
+                # Get the number of live jobs
+                n_done = len(done_job_ids)
+                n_live = len(all_job_ids) - n_done
+                n_left = len(all_job_kwargs) - n_done - n_live
+                logging.info(f"{os.getpid()}: "
+                             "{} jobs are live, "
+                             "{} are finished, "
+                             "and {} are yet to be submitted".format(n_live, n_done, n_left))
+                # Select the next jobs until `self.max_live_jobs` reached,
+                # noting that jobs are submitted in order
+                n_submitted = len(all_job_ids)
+                n_new = max(self.max_live_jobs - n_live, 0)
+                new_job_kwargs = all_job_kwargs[n_submitted:n_submitted + n_new]
+                # Submit the new jobs concurrently, since each
+                # submission is a blocking request to AWS
+                ids = executor.map(lambda job_kwargs: batch_client.submit_job(**job_kwargs),
+                                   new_job_kwargs)
+                all_job_ids.update(ids)
+                # Wait before continuing
+                logging.info(f"{os.getpid()}: Not done submitting...")
+                sleep = self._next_sleep(sleep, len(done_job_ids) != n_done_prev)
+                n_done_prev = len(done_job_ids)
+                self._wait(batch_client, all_job_ids, sleep)
 
         # Wait until all finished
-        running_job_ids = all_job_ids - done_job_ids
+        running_job_ids = all_job_ids - done_job_ids.keys()
         while len(running_job_ids) > 0:
-            running_job_ids = all_job_ids - done_job_ids
             self._assert_timeout(batch_client, running_job_ids)
-            self._assert_success(batch_client, all_job_ids, done_job_ids)
+            self._assert_success(batch_client, all_job_ids, done_job_ids,
+                                 last_status, running_stats)
+            running_job_ids = all_job_ids - done_job_ids.keys()
+            if len(running_job_ids) == 0:
+                break
             # Wait before continuing
             #logging.info("Not finished waiting...")
-            time.sleep(self.poll_time)
-
-
-    def _assert_success(self, batch_client, job_ids, done_jobs):
-        '''Assert that success rate has not been breached.'''
-
-        stats = defaultdict(int)  # Collection of failure vs total statistics
-        # Check status for each job
-        for id_ in job_ids:
-            status = batch_client.get_job_status(id_)
-            if id_ not in done_jobs:
-                logging.debug(f"{os.getpid()}: "
-                              "{} {}".format(id_, status))
-            if status == "FAILED":
-                self.failed_jobs.add(id_)
-            if status not in ("SUCCEEDED", "FAILED", "RUNNING"):
+            sleep = self._next_sleep(sleep, len(done_job_ids) != n_done_prev)
+            n_done_prev = len(done_job_ids)
+            self._wait(batch_client, running_job_ids, sleep)
+
+        # The final statuses are already known, so no need to query again
+        stats = Counter(done_job_ids.values())
+        logging.info(f"{os.getpid()}: "
+                     "{} jobs SUCCEEDED and {} jobs FAILED".format(stats["SUCCEEDED"],
+                                                                   stats["FAILED"]))
+
+    def _run_array_jobs(self, batch_client, env_variables,
+                        pending, s3file_timestamp):
+        '''Submit AWS batch array jobs, each of up to
+        :code:`MAX_ARRAY_SIZE` child jobs, and monitor them until finished
+        or failed. The parameters for each child job are uploaded to
+        a manifest on S3, from which the child job selects its own
+        parameters according to its array index.
+
+        Parameters:
+            batch_client (:obj:`BatchClient`)
+            env_variables (:obj:`list` of :obj:`dict`): Environmental
+                          variables common to every job.
+            pending (:obj:`list` of :obj:`dict`): The batchable job
+                    parameters, one per child job.
+            s3file_timestamp (str): The timestamp of the batchable zip file.
+        '''
+        # Split into evenly sized arrays (differing by at most one child
+        # job), noting that every array must contain at least two child jobs
+        n_arrays = -(-len(pending) // MAX_ARRAY_SIZE)
+        array_size, n_larger = divmod(len(pending), n_arrays)
+        s3 = boto3.resource('s3')
+        all_job_ids = set()
+        end = 0
+        for iarray in range(n_arrays):
+            start, end = end, end + array_size + (iarray < n_larger)
+            params_chunk = pending[start:end]
+            manifest = [{k: v if type(v) is str else str(v)
+                         for k, v in params.items()}
+                        for params in params_chunk]
+            manifest_key = f"{s3file_timestamp}.manifest-{iarray}.json"
+            s3.Object(S3_BATCH_BUCKET, manifest_key).put(Body=json.dumps(manifest))
+            environment = env_variables + [{"name": BATCHPAR_PREFIX + "S3MANIFEST",
+                                            "value": manifest_key}]
+            overrides = {"environment": environment,
+                         "memory": self.memory, "vcpus": self.vcpus}
+            id_ = batch_client.submit_job(jobDefinition=self.job_def,
+                                          jobName=self.job_name,
+                                          jobQueue=self.job_queue,
+                                          timeout=dict(attemptDurationSeconds=self.timeout),
+                                          containerOverrides=overrides,
+                                          arrayProperties={"size": len(manifest)})
+            all_job_ids.add(id_)
+        logging.info(f"{os.getpid()}: "
+                     "{} jobs submitted in {} array jobs".format(len(pending),
+                                                                 n_arrays))
+
+        # Wait until all finished
+        summaries = {}  # The latest status and status summary of each array
+        sleep = None
+        n_done_prev = 0
+        running_job_ids = all_job_ids
+        while len(running_job_ids) > 0:
+            self._assert_timeout(batch_client, running_job_ids)
+            summaries.update(batch_client.get_array_job_summaries(running_job_ids))
+            running_job_ids = {id_ for id_, (status, _) in summaries.items()
+                               if status not in ("SUCCEEDED", "FAILED")}
+            # Aggregate the child job statistics over all arrays, noting
+            # that the failed jobs are those arrays with any failed children
+            stats = Counter()
+            for id_, (status, status_summary) in summaries.items():
+                stats.update({status: count for status, count in status_summary.items()
+                              if status in ("SUCCEEDED", "FAILED", "RUNNING")})
+                if status == "FAILED" or status_summary.get("FAILED", 0) > 0:
+                    self.failed_jobs.add(id_)
+            logging.info(f"{os.getpid()}: "
+                         "{} child jobs are running, "
+                         "{} are finished".format(stats["RUNNING"],
+                                                  stats["SUCCEEDED"] + stats["FAILED"]))
+            self._assert_failure_rate(batch_client, stats, running_job_ids)
+            if len(running_job_ids) == 0:
+                break
+            # Wait before continuing
+            n_done = stats["SUCCEEDED"] + stats["FAILED"]
+            sleep = self._next_sleep(sleep, n_done != n_done_prev)
+            n_done_prev = n_done
+            self._wait(batch_client, running_job_ids, sleep)
+
+        logging.info(f"{os.getpid()}: "
+                     "{} jobs SUCCEEDED and {} jobs FAILED".format(stats["SUCCEEDED"],
+                                                                   stats["FAILED"]))
+
+    def _next_sleep(self, prev, changed):
+        '''Exponentially back off the time between polls, up to
+        :code:`poll_time`, unless this is the first poll (:code:`prev`
+        is :obj:`None`) or any job has changed state since the
+        previous poll, in which case reset to :code:`min_poll_time`.'''
+        if changed or prev is None:
+            return min(self.min_poll_time, self.poll_time)
+        return min(prev*2, self.poll_time)
+
+    def _wait(self, batch_client, job_ids, sleep):
+        '''Sleep with a small random jitter, so that concurrent
+        tasks don't poll AWS in lockstep. If :code:`event_queue_url` is
+        specified, instead wait on the queue, returning as soon as
+        any of :code:`job_ids` have finished. Note that every receive
+        blocks for at least a second unless messages are available,
+        and received messages are removed from the queue, so
+        this doesn't spin on unrelated events.'''
+        sleep += random.uniform(0, 0.1*sleep)
+        if self.event_queue_url is None:
+            time.sleep(sleep)
+            return
+        deadline = time.time() + sleep
+        while time.time() < deadline:
+            wait_time = int(min(20, max(deadline - time.time(), 1)))
+            statuses = batch_client.receive_job_statuses(self.event_queue_url,
+                                                         job_ids, wait_time)
+            finished = {id_: status for id_, status in statuses.items()
+                        if status in ("SUCCEEDED", "FAILED")}
+            self.event_statuses.update(finished)
+            if len(finished) > 0:
+                return
+
+
+    def _assert_success(self, batch_client, job_ids, done_jobs,
+                        last_status, running_stats):
+        '''Assert that success rate has not been breached.
+
+        Parameters:
+            batch_client (:obj:`BatchClient`)
+            job_ids (:obj:`set` of :obj:`str`): All submitted job IDs.
+            done_jobs (dict): The final status of each finished job,
+                      which is updated in place.
+            last_status (dict): The latest known status of each job,
+                        which is updated in place.
+            running_stats (:obj:`Counter`): The number of jobs with each
+                          status, which is updated in place.
+        '''
+
+        # Check status for all other jobs in bulk, unless
+        # they are already known to have finished from the event queue
+        live_job_ids = [id_ for id_ in job_ids if id_ not in done_jobs]
+        statuses = {id_: self.event_statuses[id_] for id_ in live_job_ids
+                    if id_ in self.event_statuses}
+        statuses.update(batch_client.get_job_statuses(id_ for id_ in live_job_ids
+                                                      if id_ not in statuses))
+
+        # Update the running failure vs total statistics
+        # for jobs which have changed state
+        finished = {}
+        for id_, status in statuses.items():
+            prev_status = last_status.get(id_)
+            if status == prev_status:
                 continue
-            stats[status] += 1
-            if status != "RUNNING":
-                done_jobs.add(id_)
+            logging.debug(f"{os.getpid()}: "
+                          "{} {}".format(id_, status))
+            last_status[id_] = status
+            if prev_status in ("SUCCEEDED", "FAILED", "RUNNING"):
+                running_stats[prev_status] -= 1
+            if status in ("SUCCEEDED", "FAILED", "RUNNING"):
+                running_stats[status] += 1
+            if status in ("SUCCEEDED", "FAILED"):
+                finished[id_] = status
+        stats = +running_stats  # Drop any zero counts
+
+        # Record the newly finished jobs
+        done_jobs.update(finished)
+        self.failed_jobs.update(id_ for id_, status in finished.items()
+                                if status == "FAILED")
 
         # Ignore if jobs are simply stalling
         if len(stats) == 0:
@@ -311,8 +596,17 @@ class AutoBatchTask(luigi.Task, ABC):
                          "No jobs are currently running")
             return
 
-        # Calculate the failure rate
+        # No need to terminate jobs which have already finished
+        live_job_ids = [id_ for id_ in job_ids if id_ not in done_jobs]
+        self._assert_failure_rate(batch_client, stats, live_job_ids)
+
+    def _assert_failure_rate(self, batch_client, stats, job_ids):
+        '''Assert that the failure rate, calculated from the number of
+        jobs with each status in :code:`stats`, has not been breached,
+        otherwise terminate the live :code:`job_ids`.'''
         total = sum(stats.values())
+        if total == 0:
+            return
         failure_rate = stats["FAILED"] / total
         if failure_rate <= (1 - self.success_rate):
             return
@@ -323,9 +617,11 @@ class AutoBatchTask(luigi.Task, ABC):
 
     def _assert_timeout(self, batch_client, job_ids):
         '''Assert that timeout has not been breached.'''
-        logging.info(f"{os.getpid()}: "
-                     "{} seconds left".format(self.TIMEOUT - time.time()))
-        if time.time() < self.TIMEOUT:
+        now = time.time()
+        if logging.getLogger().isEnabledFor(logging.INFO):
+            logging.info(f"{os.getpid()}: "
+                         "{} seconds left".format(self.TIMEOUT - now))
+        if now < self.TIMEOUT:
             return
         reason = f"{os.getpid()}: "
         reason += "Impending worker timeout, so killing live tasks"
@@ -78,6 +78,7 @@ logger = logging.getLogger(__name__)
 
 try:
     import boto3
+    from botocore.config import Config
 except ImportError:
     logger.warning('boto3 is not installed. BatchTasks require boto3')
 
@@ -87,6 +88,7 @@ class BatchJobException(Exception):
 
 
 POLL_TIME = 10
+MAX_POOL_CONNECTIONS = 32
 
 
 def _random_id():
@@ -95,10 +97,23 @@ def _random_id():
 
 class BatchClient(object):
 
-    def __init__(self, poll_time=POLL_TIME, **kwargs):
+    _session = None  # Shared by all BatchClients in this process
+
+    def __init__(self, poll_time=POLL_TIME,
+                 max_pool_connections=MAX_POOL_CONNECTIONS, **kwargs):
         self.poll_time = poll_time
-        self._client = boto3.client('batch', **kwargs)
-        self._log_client = boto3.client('logs', **kwargs)
+        # Credentials and service models are only loaded once per process
+        if BatchClient._session is None:
+            BatchClient._session = boto3.Session()
+        session = BatchClient._session
+        # Keep enough connections alive for concurrent requests, and
+        # fail fast on hanging connections, retrying under throttling
+        config = Config(max_pool_connections=max_pool_connections,
+                        connect_timeout=2, read_timeout=10,
+                        retries={'max_attempts': 10})
+        self._client = session.client('batch', config=config, **kwargs)
+        self._log_client = session.client('logs', **kwargs)
+        self._sqs_client = session.client('sqs', **kwargs)
         self._queue = None
         #self._queue = self.get_active_queue()
 
@@ -142,6 +157,101 @@ class BatchClient(object):
 
         return response['jobs'][0]['status']
 
+    def describe_jobs(self, job_ids, chunksize=100):
+        """Retrieve job descriptions for many jobs from the ECS API,
+        querying up to 100 jobs (the AWS limit) per request
+
+        :param job_ids (list): AWS Batch job uuids
+        :param chunksize (int): Number of jobs to query per request
+
+        Returns a dict of {job_id: job description}, excluding any jobs
+        unknown to AWS
+        """
+        job_ids = list(job_ids)
+        jobs = {}
+        for i in range(0, len(job_ids), chunksize):
+            response = self._client.describe_jobs(jobs=job_ids[i:i+chunksize])
+            # Error checking
+            status_code = response['ResponseMetadata']['HTTPStatusCode']
+            if status_code != 200:
+                msg = 'Job status request received status code {0}:\n{1}'
+                raise Exception(msg.format(status_code, response))
+            for job in response['jobs']:
+                jobs[job['jobId']] = job
+        return jobs
+
+    def get_job_statuses(self, job_ids, chunksize=100):
+        """Retrieve task statuses for many jobs from the ECS API
+
+        :param job_ids (list): AWS Batch job uuids
+        :param chunksize (int): Number of jobs to query per request
+
+        Returns a dict of {job_id: status}, where status is as
+        returned by :obj:`get_job_status`
+        """
+        job_ids = list(job_ids)
+        jobs = self.describe_jobs(job_ids, chunksize=chunksize)
+        # Jobs unknown to AWS are considered to have failed
+        return {job_id: jobs[job_id]['status'] if job_id in jobs else 'FAILED'
+                for job_id in job_ids}
+
+    def get_array_job_summaries(self, job_ids):
+        """Retrieve the status and child job status summary for array jobs
+
+        :param job_ids (list): AWS Batch array job uuids
+
+        Returns a dict of {job_id: (status, {status: count})}, where
+        status is as returned by :obj:`get_job_status`
+        """
+        job_ids = list(job_ids)
+        jobs = self.describe_jobs(job_ids)
+        summaries = {}
+        for job_id in job_ids:
+            # Jobs unknown to AWS are considered to have failed
+            if job_id not in jobs:
+                summaries[job_id] = ('FAILED', {})
+                continue
+            job = jobs[job_id]
+            status_summary = job['arrayProperties'].get('statusSummary', {})
+            summaries[job_id] = (job['status'], status_summary)
+        return summaries
+
+    def receive_job_statuses(self, queue_url, job_ids, wait_time=20):
+        """Long poll an SQS queue, which is subscribed (via an EventBridge
+        rule) to AWS Batch "Batch Job State Change" events, returning as
+        soon as any events for the given jobs are received. The queue
+        is assumed to be dedicated to the caller, and so every message
+        received is removed from the queue, since events for other jobs
+        (e.g. from previous runs) are stale.
+
+        :param queue_url (str): URL of the SQS queue
+        :param job_ids (set): AWS Batch job uuids of interest
+        :param wait_time (int): Maximum time in seconds (up to 20) to wait
+
+        Returns a dict of {job_id: status} for jobs with new events
+        """
+        statuses = {}
+        while True:
+            response = self._sqs_client.receive_message(QueueUrl=queue_url,
+                                                        WaitTimeSeconds=wait_time,
+                                                        MaxNumberOfMessages=10)
+            messages = response.get('Messages', [])
+            if len(messages) == 0:
+                return statuses
+            for message in messages:
+                detail = json.loads(message['Body']).get('detail', {})
+                if detail.get('jobId') in job_ids:
+                    statuses[detail['jobId']] = detail['status']
+            entries = [{'Id': message['MessageId'],
+                        'ReceiptHandle': message['ReceiptHandle']}
+                       for message in messages]
+            self._sqs_client.delete_message_batch(QueueUrl=queue_url,
+                                                  Entries=entries)
+            if len(statuses) == 0:
+                return statuses
+            # Drain any remaining events without waiting
+            wait_time = 0
+
     def get_logs(self, log_stream_name, get_last=50):
         """Retrieve log stream from CloudWatch"""
         response = self._log_client.get_log_events(
@@ -180,9 +290,9 @@ class BatchClient(object):
         time.sleep(30)
 
         # Check which jobs are still running
-        job_ids = [job_id for job_id in job_ids 
-                   if self.get_job_status(job_id) 
-                   not in ("FAILED", "SUCCEEDED")]
+        statuses = self.get_job_statuses(job_ids)
+        job_ids = [job_id for job_id, status in statuses.items()
+                   if status not in ("FAILED", "SUCCEEDED")]
         if len(job_ids) > 0 and iattempt < 10:
             print("Still got", len(job_ids),
                   "hanging batch jobs to terminate")
@@ -0,0 +1,352 @@
+import itertools
+import json
+import time
+from unittest import mock
+
+import pytest
+
+from nesta.core.luigihacks.autobatch import AutoBatchTask
+from nesta.core.luigihacks.autobatch import S3_BATCH_BUCKET
+from nesta.core.luigihacks.autobatch import _get_aws_credentials
+from nesta.core.luigihacks.autobatch import command_line
+from nesta.core.luigihacks.batchclient import BatchJobException
+
+
+class ShardedTask(AutoBatchTask):
+    """Minimal subclass, with sharded preparation."""
+    def prepare(self):
+        return [{"done": False, "outinfo": "serial"}]
+
+    def prepare_shards(self):
+        return [[0, 1], [2], [3, 4]]
+
+    def prepare_one(self, shard):
+        return [{"done": False, "outinfo": i} for i in shard]
+
+    def combine(self, job_params):
+        self.combined = "serial"
+
+
+class ShardedCombineTask(ShardedTask):
+    """Minimal subclass, with sharded preparation and combination."""
+    def combine_shards(self, job_params):
+        return [job_params[:2], job_params[2:]]
+
+    def combine_one(self, shard):
+        return sum(params["outinfo"] for params in shard)
+
+    def combine_results(self, job_params, results):
+        self.combined = results
+
+
+def _sharded_task(task_class=ShardedTask, **kwargs):
+    return task_class(batchable='', job_def='', job_name='', job_queue='',
+                      region_name='', **kwargs)
+
+
+def _batch_client(status):
+    '''Mocked BatchClient, for which every job has the given status'''
+    client = mock.Mock()
+    client.submit_job.side_effect = map(str, itertools.count())
+    client.get_job_statuses.side_effect = lambda job_ids: {id_: status
+                                                           for id_ in job_ids}
+    client.hard_terminate.side_effect = BatchJobException
+    return client
+
+
+def _array_client(status, status_summary):
+    '''Mocked BatchClient, for which every array job has the given
+    status and child job status summary'''
+    client = mock.Mock()
+    client.submit_job.side_effect = map(str, itertools.count())
+    client.get_array_job_summaries.side_effect = lambda job_ids: {
+        id_: (status, status_summary) for id_ in job_ids
+    }
+    client.hard_terminate.side_effect = BatchJobException
+    return client
+
+
+class _RunningOnceBatchClient:
+    '''Fake BatchClient, for which each job is RUNNING the first
+    time that it is queried, and SUCCEEDED thereafter'''
+    def __init__(self):
+        self.submitted = []
+        self.queried = set()
+        self.finished = set()
+        self.max_live = 0
+
+    def submit_job(self, jobName, **kwargs):
+        self.submitted.append(jobName)
+        self.max_live = max(self.max_live,
+                            len(self.submitted) - len(self.finished))
+        return jobName
+
+    def get_job_statuses(self, job_ids):
+        statuses = {}
+        for id_ in job_ids:
+            statuses[id_] = "SUCCEEDED" if id_ in self.queried else "RUNNING"
+            self.queried.add(id_)
+        self.finished.update(id_ for id_, status in statuses.items()
+                             if status == "SUCCEEDED")
+        return statuses
+
+
+def _job_kwargs(n):
+    return [{"jobName": str(i)} for i in range(n)]
+
+
+def test_command_line_returns_final_line():
+    assert command_line(["printf", "first\nsecond\nfinal\n"]) == "final"
+
+
+def test_command_line_without_trailing_newline():
+    assert command_line(["printf", "first\nfinal"], verbose=True) == "final"
+
+
+def test_command_line_arguments_not_split():
+    assert command_line(["echo", "file name with spaces"]) == "file name with spaces"
+
+
+def test_prepare_serial_by_default():
+    assert _sharded_task()._prepare() == [{"done": False, "outinfo": "serial"}]
+
+
+def test_prepare_parallel():
+    job_params = _sharded_task(prepare_workers=2)._prepare()
+    assert job_params == [{"done": False, "outinfo": i} for i in range(5)]
+
+
+def test_combine_serial_if_not_implemented():
+    # ShardedTask doesn't implement the sharded combine methods
+    task = _sharded_task(combine_workers=2)
+    task._combine([])
+    assert task.combined == "serial"
+
+
+def test_combine_serial_by_default():
+    task = _sharded_task(ShardedCombineTask)
+    task._combine([])
+    assert task.combined == "serial"
+
+
+def test_combine_parallel():
+    task = _sharded_task(ShardedCombineTask, combine_workers=2)
+    task._combine([{"done": True, "outinfo": i} for i in range(5)])
+    assert task.combined == [0 + 1, 2 + 3 + 4]
+
+
+@mock.patch.object(AutoBatchTask, "_wait")
+def test_run_batch_jobs_stats_not_shared_between_runs(mocked_wait):
+    task = _sharded_task(submit_workers=1)
+    task.TIMEOUT = time.time() + 100
+    # The first run fails...
+    with pytest.raises(BatchJobException):
+        task._run_batch_jobs(_batch_client("FAILED"), _job_kwargs(3))
+    # ...which shouldn't affect a retry on the same instance
+    client = _batch_client("SUCCEEDED")
+    task._run_batch_jobs(client, _job_kwargs(4))
+    assert client.hard_terminate.call_count == 0
+
+
+@mock.patch("nesta.core.luigihacks.autobatch.time.sleep")
+def test_wait_without_event_queue(mocked_sleep):
+    _sharded_task()._wait(mock.Mock(), {"a"}, 10)
+    (sleep,), _ = mocked_sleep.call_args
+    assert 10 <= sleep <= 11
+
+
+def test_wait_on_event_queue():
+    task = _sharded_task(event_queue_url="queue")
+    client = mock.Mock()
+    client.receive_job_statuses.side_effect = [{}, {"a": "RUNNING"},
+                                               {"a": "SUCCEEDED"}, {}]
+    task._wait(client, {"a", "b"}, 100)
+    # Return as soon as any job has finished
+    assert client.receive_job_statuses.call_count == 3
+    assert task.event_statuses == {"a": "SUCCEEDED"}
+    # Every receive is a long poll
+    for (queue_url, job_ids, wait_time), _ in client.receive_job_statuses.call_args_list:
+        assert (queue_url, job_ids) == ("queue", {"a", "b"})
+        assert 1 <= wait_time <= 20
+
+
+@mock.patch.object(AutoBatchTask, "_wait")
+@mock.patch("nesta.core.luigihacks.autobatch.MAX_ARRAY_SIZE", 3)
+@mock.patch("nesta.core.luigihacks.autobatch.boto3")
+def test_run_array_jobs(mocked_boto3, mocked_wait):
+    task = _sharded_task(array_job=True)
+    task.TIMEOUT = time.time() + 100
+    client = _array_client("SUCCEEDED", {"SUCCEEDED": 3})
+    pending = [{"done": False, "outinfo": i} for i in range(7)]
+    task._run_array_jobs(client, [], pending, "ts")
+
+    # One manifest per array, with stringified parameters
+    s3 = mocked_boto3.resource.return_value
+    keys = [args for args, _ in s3.Object.call_args_list]
+    assert keys == [(S3_BATCH_BUCKET, f"ts.manifest-{i}.json") for i in range(3)]
+    manifests = [json.loads(kwargs["Body"]) for _, kwargs in
+                 s3.Object.return_value.put.call_args_list]
+    assert manifests == [[{"done": "False", "outinfo": str(i)} for i in chunk]
+                         for chunk in ([0, 1, 2], [3, 4], [5, 6])]
+
+    # Evenly sized arrays, each pointing to its own manifest
+    submitted = [kwargs for _, kwargs in client.submit_job.call_args_list]
+    assert [kwargs["arrayProperties"] for kwargs in submitted] == [{"size": 3},
+                                                                  {"size": 2},
+                                                                  {"size": 2}]
+    assert [kwargs["containerOverrides"]["environment"] for kwargs in submitted] == \
+        [[{"name": "BATCHPAR_S3MANIFEST", "value": key}] for _, key in keys]
+    assert client.hard_terminate.call_count == 0
+    assert task.failed_jobs == set()
+
+
+@mock.patch.object(AutoBatchTask, "_wait")
+@mock.patch("nesta.core.luigihacks.autobatch.MAX_ARRAY_SIZE", 3)
+@mock.patch("nesta.core.luigihacks.autobatch.boto3")
+def test_run_array_jobs_high_failure_rate(mocked_boto3, mocked_wait):
+    task = _sharded_task(array_job=True, success_rate=0.9)
+    task.TIMEOUT = time.time() + 100
+    client = _array_client("RUNNING", {"RUNNING": 2, "FAILED": 1})
+    pending = [{"done": False, "outinfo": i} for i in range(7)]
+    with pytest.raises(BatchJobException):
+        task._run_array_jobs(client, [], pending, "ts")
+    client.hard_terminate.assert_called_once()
+    _, kwargs = client.hard_terminate.call_args
+    assert kwargs["job_ids"] == {"0", "1", "2"}
+    assert kwargs["reason"].startswith("Exiting due to high failure rate: 33%")
+    assert task.failed_jobs == {"0", "1", "2"}
+
+
+def test_next_sleep():
+    task = _sharded_task(min_poll_time=5, poll_time=60)
+    assert task._next_sleep(None, False) == 5
+    assert task._next_sleep(5, False) == 10
+    assert task._next_sleep(40, False) == 60
+    assert task._next_sleep(60, True) == 5
+
+
+@mock.patch.object(AutoBatchTask, "_wait")
+def test_run_batch_jobs(mocked_wait):
+    task = _sharded_task(max_live_jobs=2, min_poll_time=5, poll_time=60)
+    task.TIMEOUT = time.time() + 100
+    client = _RunningOnceBatchClient()
+    # No waiting once every job has finished
+    def wait(batch_client, job_ids, sleep):
+        assert len(client.finished) < 5
+    mocked_wait.side_effect = wait
+    task._run_batch_jobs(client, _job_kwargs(5))
+    # Every job is submitted exactly once, in order, with no
+    # more than max_live_jobs live at once
+    assert client.submitted == [str(i) for i in range(5)]
+    assert client.max_live == 2
+    assert client.finished == set(client.submitted)
+    # Back off whilst no jobs finish, starting from min_poll_time
+    sleeps = [sleep for (_, _, sleep), _ in mocked_wait.call_args_list]
+    assert sleeps == [5, 10, 5, 10, 5, 10]
+
+
+@mock.patch.object(AutoBatchTask, "_wait")
+def test_run_batch_jobs_one_live_job(mocked_wait):
+    task = _sharded_task(max_live_jobs=1)
+    task.TIMEOUT = time.time() + 100
+    client = _RunningOnceBatchClient()
+    task._run_batch_jobs(client, _job_kwargs(3))
+    assert client.submitted == ["0", "1", "2"]
+    assert client.max_live == 1
+
+
+@mock.patch("nesta.core.luigihacks.autobatch.boto3")
+def test_get_aws_credentials(mocked_boto3):
+    _get_aws_credentials.cache_clear()
+    get_credentials = mocked_boto3.Session.return_value.get_credentials
+    get_credentials.return_value = None
+    with pytest.raises(BatchJobException):
+        _get_aws_credentials()
+    # The missing credentials aren't cached
+    get_credentials.return_value = "credentials"
+    assert _get_aws_credentials() == "credentials"
+    assert _get_aws_credentials() == "credentials"
+    assert get_credentials.call_count == 2
+    _get_aws_credentials.cache_clear()
+
+
+@mock.patch("nesta.core.luigihacks.autobatch.check_output",
+            side_effect=FileNotFoundError)
+def test_run_prepare_batch_not_found(mocked_check_output):
+    with pytest.raises(BatchJobException):
+        _sharded_task(env_files=["missing"]).run()
+
+
+def _execute(task, job_params, token=None):
+    '''Run execute with mocked AWS credentials and batch client,
+    returning the mocked batch client'''
+    task.TIMEOUT = time.time() + 100
+    target = "nesta.core.luigihacks.autobatch"
+    with mock.patch(f"{target}._get_aws_credentials") as mocked_credentials, \
+         mock.patch(f"{target}.batchclient.BatchClient") as mocked_client:
+        frozen = mocked_credentials.return_value.get_frozen_credentials
+        frozen.return_value = ("id", "secret", token)
+        task.execute(job_params, "ts")
+    return mocked_client.return_value
+
+
+@mock.patch.object(AutoBatchTask, "_run_array_jobs")
+@mock.patch.object(AutoBatchTask, "_run_batch_jobs")
+def test_execute(mocked_run_batch, mocked_run_array):
+    task = _sharded_task(max_runs=2, memory=1024, vcpus=2)
+    job_params = [{"done": True, "outinfo": "a"},
+                  {"done": False, "outinfo": "b", "n": 1},
+                  {"done": True, "outinfo": "c"},
+                  {"done": False, "outinfo": "d", "n": 2},
+                  {"done": False, "outinfo": "e", "n": 3}]
+    client = _execute(task, job_params, token="token")
+    assert mocked_run_array.call_count == 0
+    (batch_client, all_job_kwargs), _ = mocked_run_batch.call_args
+    assert batch_client is client
+    # Done jobs are skipped, and max_runs counts pending jobs
+    assert [kwargs["containerOverrides"]["environment"]
+            for kwargs in all_job_kwargs] == [
+        [{"name": "AWS_ACCESS_KEY_ID", "value": "id"},
+         {"name": "AWS_SECRET_ACCESS_KEY", "value": "secret"},
+         {"name": "BATCHPAR_S3FILE_TIMESTAMP", "value": "ts"},
+         {"name": "AWS_SESSION_TOKEN", "value": "token"},
+         {"name": "BATCHPAR_done", "value": "False"},
+         {"name": "BATCHPAR_outinfo", "value": outinfo},
+         {"name": "BATCHPAR_n", "value": n}]
+        for outinfo, n in (("b", "1"), ("d", "2"))
+    ]
+    for kwargs in all_job_kwargs:
+        assert kwargs["containerOverrides"]["memory"] == 1024
+        assert kwargs["containerOverrides"]["vcpus"] == 2
+
+
+@mock.patch.object(AutoBatchTask, "_run_array_jobs")
+@mock.patch.object(AutoBatchTask, "_run_batch_jobs")
+def test_execute_without_token(mocked_run_batch, mocked_run_array):
+    _execute(_sharded_task(), [{"done": False, "outinfo": "a"}])
+    (_, all_job_kwargs), _ = mocked_run_batch.call_args
+    names = [env["name"] for env in
+             all_job_kwargs[0]["containerOverrides"]["environment"]]
+    assert "AWS_SESSION_TOKEN" not in names
+
+
+@mock.patch.object(AutoBatchTask, "_run_array_jobs")
+@mock.patch.object(AutoBatchTask, "_run_batch_jobs")
+def test_execute_array_job(mocked_run_batch, mocked_run_array):
+    task = _sharded_task(array_job=True, max_runs=10)
+    # A single pending job can't be submitted as an array
+    _execute(task, [{"done": False, "outinfo": "a"},
+                    {"done": True, "outinfo": "b"}])
+    assert mocked_run_batch.call_count == 1
+    assert mocked_run_array.call_count == 0
+    # Otherwise all pending jobs are submitted as arrays
+    job_params = [{"done": False, "outinfo": i} for i in range(3)]
+    client = _execute(task, job_params)
+    (batch_client, env_variables, pending, timestamp), _ = mocked_run_array.call_args
+    assert batch_client is client
+    assert env_variables == [{"name": "AWS_ACCESS_KEY_ID", "value": "id"},
+                             {"name": "AWS_SECRET_ACCESS_KEY", "value": "secret"},
+                             {"name": "BATCHPAR_S3FILE_TIMESTAMP", "value": "ts"}]
+    assert pending == job_params
+    assert timestamp == "ts"
+    assert mocked_run_batch.call_count == 1
@@ -0,0 +1,95 @@
+import json
+from unittest import mock
+
+from nesta.core.luigihacks.batchclient import BatchClient
+
+
+def setup_function():
+    # Don't share mocked sessions between tests
+    BatchClient._session = None
+
+
+def _describe_jobs(jobs):
+    return {'ResponseMetadata': {'HTTPStatusCode': 200},
+            'jobs': [{'jobId': job_id, 'status': 'RUNNING'}
+                     for job_id in jobs if job_id != 'unknown']}
+
+
+@mock.patch('nesta.core.luigihacks.batchclient.boto3')
+def test_get_job_statuses_chunks_requests(mocked_boto3):
+    client = BatchClient()
+    client._client.describe_jobs.side_effect = _describe_jobs
+    job_ids = [str(i) for i in range(250)]
+    statuses = client.get_job_statuses(job_ids)
+    assert client._client.describe_jobs.call_count == 3
+    assert statuses == {job_id: 'RUNNING' for job_id in job_ids}
+
+
+@mock.patch('nesta.core.luigihacks.batchclient.boto3')
+def test_get_job_statuses_unknown_job_failed(mocked_boto3):
+    client = BatchClient()
+    client._client.describe_jobs.side_effect = _describe_jobs
+    statuses = client.get_job_statuses(['a', 'unknown'])
+    assert statuses == {'a': 'RUNNING', 'unknown': 'FAILED'}
+
+
+@mock.patch('nesta.core.luigihacks.batchclient.boto3')
+def test_get_job_statuses_no_jobs(mocked_boto3):
+    client = BatchClient()
+    assert client.get_job_statuses([]) == {}
+    assert client._client.describe_jobs.call_count == 0
+
+
+def _message(job_id, status):
+    body = {'detail-type': 'Batch Job State Change',
+            'detail': {'jobId': job_id, 'status': status}}
+    return {'MessageId': f'msg-{job_id}', 'ReceiptHandle': f'rh-{job_id}',
+            'Body': json.dumps(body)}
+
+
+@mock.patch('nesta.core.luigihacks.batchclient.boto3')
+def test_receive_job_statuses(mocked_boto3):
+    client = BatchClient()
+    client._sqs_client.receive_message.side_effect = [
+        {'Messages': [_message('a', 'SUCCEEDED'), _message('other', 'FAILED')]},
+        {'Messages': [_message('b', 'RUNNING')]},
+        {}
+    ]
+    statuses = client.receive_job_statuses('queue', {'a', 'b'})
+    assert statuses == {'a': 'SUCCEEDED', 'b': 'RUNNING'}
+    # Stale messages for other jobs are also removed from the queue
+    entries = [kwargs['Entries'] for _, kwargs in
+               client._sqs_client.delete_message_batch.call_args_list]
+    assert entries == [[{'Id': 'msg-a', 'ReceiptHandle': 'rh-a'},
+                        {'Id': 'msg-other', 'ReceiptHandle': 'rh-other'}],
+                       [{'Id': 'msg-b', 'ReceiptHandle': 'rh-b'}]]
+    # Only the first receive waits
+    wait_times = [kwargs['WaitTimeSeconds'] for _, kwargs in
+                  client._sqs_client.receive_message.call_args_list]
+    assert wait_times == [20, 0, 0]
+
+
+@mock.patch('nesta.core.luigihacks.batchclient.boto3')
+def test_receive_job_statuses_only_other_jobs(mocked_boto3):
+    client = BatchClient()
+    client._sqs_client.receive_message.return_value = {
+        'Messages': [_message('other', 'SUCCEEDED')]
+    }
+    assert client.receive_job_statuses('queue', {'a'}) == {}
+    assert client._sqs_client.receive_message.call_count == 1
+    client._sqs_client.delete_message_batch.assert_called_once_with(
+        QueueUrl='queue',
+        Entries=[{'Id': 'msg-other', 'ReceiptHandle': 'rh-other'}])
+
+
+@mock.patch('nesta.core.luigihacks.batchclient.boto3')
+def test_get_array_job_summaries(mocked_boto3):
+    client = BatchClient()
+    summary = {'SUCCEEDED': 3, 'RUNNING': 1}
+    client._client.describe_jobs.return_value = {
+        'ResponseMetadata': {'HTTPStatusCode': 200},
+        'jobs': [{'jobId': 'a', 'status': 'PENDING',
+                  'arrayProperties': {'statusSummary': summary, 'size': 4}}]
+    }
+    summaries = client.get_array_job_summaries(['a', 'unknown'])
+    assert summaries == {'a': ('PENDING', summary), 'unknown': ('FAILED', {})}
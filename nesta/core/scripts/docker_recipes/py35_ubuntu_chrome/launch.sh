@@ -0,0 +1,33 @@
+#!/bin/bash
+
+# Install any other python packages which aren't picked up
+# in the requirements
+sudo ls /usr/bin/pip*
+sudo /home/ubuntu/.local/bin/pip3.5 install awscli --upgrade --user
+
+# Pull the batchable from S3
+echo "Getting file" ${BATCHPAR_S3FILE_TIMESTAMP}
+~/.local/bin/aws s3 cp s3://nesta-batch/${BATCHPAR_S3FILE_TIMESTAMP} run.zip
+/usr/bin/unzip run.zip
+cd run
+
+# Array jobs read their parameters from a manifest,
+# according to their index in the array
+if [[ -n "${BATCHPAR_S3MANIFEST}" ]]; then
+    echo "Getting manifest" ${BATCHPAR_S3MANIFEST}
+    ~/.local/bin/aws s3 cp s3://nesta-batch/${BATCHPAR_S3MANIFEST} manifest.json
+    eval "$(/usr/bin/python3 -c '
+import json, os, shlex
+index = int(os.environ["AWS_BATCH_JOB_ARRAY_INDEX"])
+for k, v in json.load(open("manifest.json"))[index].items():
+    print("export BATCHPAR_{}={}".format(k, shlex.quote(v)))
+')"
+fi
+
+# Install dependencies from the requirements file
+sudo pip3 install -r requirements.txt
+
+# Check the file exists and run it
+echo "Starting..."
+cat run.py &> /dev/null
+time /usr/bin/python3 run.py
@@ -0,0 +1,41 @@
+#!/bin/bash
+
+# Install any other python packages which aren't picked up
+# in the requirements
+sudo ls /usr/bin/pip*
+sudo /usr/bin/pip-3.6 install awscli --upgrade --user
+# sudo /usr/bin/pip-3.6 install pyvirtualdisplay
+
+# Pull the batchable from S3
+echo "Getting file" ${BATCHPAR_S3FILE_TIMESTAMP}
+aws s3 cp s3://nesta-batch/${BATCHPAR_S3FILE_TIMESTAMP} run.zip
+/usr/bin/unzip run.zip
+cd run
+
+# Array jobs read their parameters from a manifest,
+# according to their index in the array
+if [[ -n "${BATCHPAR_S3MANIFEST}" ]]; then
+    echo "Getting manifest" ${BATCHPAR_S3MANIFEST}
+    aws s3 cp s3://nesta-batch/${BATCHPAR_S3MANIFEST} manifest.json
+    eval "$(python3 -c '
+import json, os, shlex
+index = int(os.environ["AWS_BATCH_JOB_ARRAY_INDEX"])
+for k, v in json.load(open("manifest.json"))[index].items():
+    print("export BATCHPAR_{}={}".format(k, shlex.quote(v)))
+')"
+fi
+
+#export WORLD_BORDERS="meetup/data/TM_WORLD_BORDERS_SIMPL-0.3.shp"
+
+# You could install anything else here as you wish, 
+# but you should really do this in the Dockerfile
+# sudo yum -y install wget
+# sudo yum -y install findutils
+
+# Install dependencies from the requirements file
+sudo /usr/bin/pip-3.6 install -r requirements.txt
+
+# Check the file exists and run it
+echo "Starting..."
+cat run.py &> /dev/null
+time python3 run.py
@@ -0,0 +1,45 @@
+#!/bin/bash
+
+# Install any other python packages which aren't picked up
+# in the requirements
+source activate py36
+which pip
+which python
+pip install awscli --upgrade --user
+pip install lxml
+conda clean -afy
+
+# Pull the batchable from S3
+echo "Getting file" ${BATCHPAR_S3FILE_TIMESTAMP}
+aws s3 cp s3://nesta-batch/${BATCHPAR_S3FILE_TIMESTAMP} run.zip
+/usr/bin/unzip run.zip
+rm run.zip  # clear up some space
+cd run
+
+# Array jobs read their parameters from a manifest,
+# according to their index in the array
+if [[ -n "${BATCHPAR_S3MANIFEST}" ]]; then
+    echo "Getting manifest" ${BATCHPAR_S3MANIFEST}
+    aws s3 cp s3://nesta-batch/${BATCHPAR_S3MANIFEST} manifest.json
+    eval "$(python -c '
+import json, os, shlex
+index = int(os.environ["AWS_BATCH_JOB_ARRAY_INDEX"])
+for k, v in json.load(open("manifest.json"))[index].items():
+    print("export BATCHPAR_{}={}".format(k, shlex.quote(v)))
+')"
+fi
+
+ls
+
+# Print out the caller id
+#aws sts get-caller-identity
+#aws iam list-roles
+sed -i '/tensorflow/d' requirements.txt  # rm TF from reqs since it's huge
+pip install -r requirements.txt
+#pip freeze
+conda clean -afy
+
+# Check the file exists and run it
+echo "Starting..."
+cat run.py &> /dev/null
+time python run.py
@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 import logging
 import os
 import requests
@@ -8,6 +9,9 @@ import shapefile
 import numpy as np
 from . import meetup_utils
 
+# The number of times to retry a bad response from the Meetup API
+MAX_RETRIES = 10
+
 
 def generate_coords(x0, y0, x1, y1, n):
     '''Generate :math:`\mathcal{O}(\\frac{n}{2}^2)` coordinates in the bounding box
@@ -168,49 +172,63 @@ class MeetupCountryGroups:
         self.groups = []
 
 
-    def get_groups(self, lon, lat, offset=0, max_pages=None):
-        '''Recursively get all groups for the given parameters.
-        It is assumed that you will run with the default arguments,
-        since they are set automatically in the recursing procedure.
+    def get_page(self, lon, lat, offset):
+        '''Get a single page of groups for the given coordinates,
+        retrying up to :code:`MAX_RETRIES` times until a good response
+        is received.'''
+        params = dict(self.params, offset=offset, lat=lat, lon=lon,
+                      key=meetup_utils.get_api_key())
+        for attempt in range(MAX_RETRIES + 1):
+            if attempt > 0:
+                time.sleep(10)
+                logging.info("Got a bad response, so retrying page %s" % offset)
+
+            # Work out whether the task has failed or not
+            failed = False
+            try:
+                r = requests.get("https://api.meetup.com/2/groups",
+                                 params=params)
+                r.raise_for_status()
+            except Exception as err:
+                failed = True
+                if type(err) not in (requests.exceptions.HTTPError,
+                                     requests.exceptions.ChunkedEncodingError,
+                                     ConnectionResetError):
+                    if "reset by peer" in str(err):
+                        logging.info("Reset by peer error")
+                    else:
+                        raise err
+            if not failed:
+                failed = len(r.text) == 0
+            if not failed:
+                return r.json()
+        raise requests.exceptions.RetryError("Got %s bad responses for page %s"
+                                             % (MAX_RETRIES + 1, offset))
+
+
+    def get_pages(self, lon, lat, offset=0, max_pages=None):
+        '''Get all pages of groups for the given coordinates, by following
+        the "next" url specified in each page.
+
+        Returns:
+            :obj:`list` of :obj:`list`: The results from each page.
         '''
-        
-        # Check if we're in too deep
-        if max_pages is not None and offset >= max_pages:
-            return
-        # Set the offset parameter and make the request
-        self.params["offset"] = offset
-        self.params['lat'] = lat
-        self.params['lon'] = lon
-        self.params['key'] = meetup_utils.get_api_key()
-        
-        # Work out whether the task has failed or not
-        failed = False
-        try:
-            r = requests.get("https://api.meetup.com/2/groups",
-                             params=self.params)
-            r.raise_for_status()
-        except Exception as err:
-            failed = True
-            if type(err) not in (requests.exceptions.HTTPError, 
-                                 requests.exceptions.ChunkedEncodingError,
-                                 ConnectionResetError):
-                if "reset by peer" in str(err):
-                    logging.info("Reset by peer error")
-                else:
-                    raise err
-        if not failed:
-            failed = len(r.text) == 0
-
-        # If no response is found
-        if failed:
-            time.sleep(10)
-            logging.info("Got a bad response, so retrying page %s" % offset)
-            return self.get_groups(lon, lat, offset=offset, max_pages=max_pages)
-
-        # Extract results in the country of interest (bonus countries
-        # can enter the fold because of the radius parameter)
-        data = r.json()
-        for row in data["results"]:
+        pages = []
+        # Stop if we're in too deep
+        while max_pages is None or offset < max_pages:
+            data = self.get_page(lon, lat, offset)
+            pages.append(data["results"])
+            # Check if a "next" url is specified
+            if data["meta"]["next"] == "":
+                break
+            offset += 1
+        return pages
+
+
+    def add_groups(self, results):
+        '''Extract results in the country of interest (bonus countries
+        can enter the fold because of the radius parameter)'''
+        for row in results:
             if row['id'] in self.ids:
                 continue
             if row["country"].lower() != self.country_code.lower():
@@ -221,19 +239,30 @@ class MeetupCountryGroups:
                 continue
             self.ids.add(row['id'])
             self.groups.append(row)
-        # Check if a "next" url is specified
-        next_url = data["meta"]["next"]
-        if next_url != "":
-            # If so, increment offset and get the groups
-            self.get_groups(lon, lat, offset=offset+1, max_pages=max_pages)
-
-
-    def get_groups_recursive(self):
-        '''Call :code:`get_groups` for each lat,lon coordinate'''
-        for i, (lon, lat) in enumerate(self.coords):
-            logging.info("--> %s / %s ==> %s" % 
-                         (i+1, len(self.coords), len(self.groups)))
-            self.get_groups(lon, lat)
+
+
+    def get_groups(self, lon, lat, offset=0, max_pages=None):
+        '''Get all groups for the given parameters.
+        It is assumed that you will run with the default arguments.
+        '''
+        for results in self.get_pages(lon, lat, offset=offset,
+                                      max_pages=max_pages):
+            self.add_groups(results)
+
+
+    def get_groups_recursive(self, n_workers=8):
+        '''Call :code:`get_groups` for each lat,lon coordinate. Since
+        the requests are I/O bound, the pages for up to :code:`n_workers`
+        coordinates are requested concurrently, although the groups
+        are still added in order of the coordinates.'''
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            all_pages = executor.map(lambda coord: self.get_pages(*coord),
+                                     self.coords)
+            for i, pages in enumerate(all_pages):
+                for results in pages:
+                    self.add_groups(results)
+                logging.info("--> %s / %s ==> %s" %
+                             (i+1, len(self.coords), len(self.groups)))
 
 
 if __name__ == "__main__":
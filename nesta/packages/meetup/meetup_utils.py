@@ -2,6 +2,10 @@ import os
 import random
 import json
 import numpy as np
+try:
+    from pandas import json_normalize
+except ImportError:  # pandas < 1.0
+    from pandas.io.json import json_normalize
 from nesta.core.orms.orm_utils import db_session
 from nesta.core.orms.meetup_orm import Group
 from collections import Counter
@@ -76,6 +80,60 @@ def flatten_data(list_json_data, keys, **kwargs):
     return output
 
 
+def _get_values(list_json_data, key):
+    '''Generate the value of a (possibly nested) key from every row of
+    row-orientated JSON data, skipping rows in which it isn't found.'''
+    path = [key] if type(key) == str else key
+    for info in list_json_data:
+        value = info
+        try:
+            for _k in path:
+                value = value[_k]
+        except (KeyError, TypeError):
+            continue
+        yield value
+
+
+def normalize_data(list_json_data, keys, **kwargs):
+    '''A vectorised equivalent of :obj:`flatten_data`, which flattens
+    the nested JSON data with :obj:`pandas.io.json.json_normalize`
+    rather than looping over every key of every row. Unlike
+    :obj:`flatten_data`, fields which aren't found are explicitly
+    included in the output as :obj:`None`, unless a constant value
+    for the field is provided in :code:`kwargs`.
+
+    Args:
+        list_json_data (:obj:`json`): Row-orientated JSON data.
+        keys (:obj:`list`): See :obj:`flatten_data`.
+        **kwargs: Any constants to include in every flattened row of the output.
+
+    Returns:
+       :obj:`json`: Flattened row-orientated JSON data.
+    '''
+    columns = [k if type(k) == str else "_".join(k) for k in keys]
+    df = json_normalize(list_json_data, sep="_").reindex(columns=columns)
+    # Integer fields with missing values are promoted to float by pandas,
+    # so identify fields for which every value in the original data is an int
+    int_columns = [column for k, column in zip(keys, columns)
+                   if df[column].dtype == float
+                   and all(type(value) is int
+                           for value in _get_values(list_json_data, k)
+                           if value is not None)]
+    # Fields found in the data take precedence over the constants
+    constants = {k: v for k, v in kwargs.items() if k not in df.columns}
+    for k in df.columns.intersection(list(kwargs)):
+        df[k] = df[k].fillna(kwargs[k])
+    # Fields which aren't found will appear as NULL in the database
+    df = df.astype(object).where(df.notnull(), None)
+    output = []
+    for row in df.to_dict(orient="records"):
+        for column in int_columns:
+            if isinstance(row[column], float):
+                row[column] = int(row[column])
+        output.append(dict(constants, **row))
+    return output
+
+
 def get_members_by_percentile(engine, perc=10):
     """Get the number of meetup group members for a given percentile
     from the database.
@@ -0,0 +1,83 @@
+import threading
+from unittest import mock
+
+import pytest
+import requests
+
+from nesta.packages.meetup.country_groups import MAX_RETRIES
+from nesta.packages.meetup.country_groups import MeetupCountryGroups
+
+PATCH_PREFIX = "nesta.packages.meetup.country_groups"
+
+
+def _group(id_, country="GB", category=34):
+    return {"id": id_, "country": country, "category": {"id": category}}
+
+
+# The pages of results at each (lon, lat) coordinate
+PAGES = {(0, 0): [[_group(1), _group(2)], [_group(3)]],
+         (1, 1): [[_group(2), _group(4, country="FR"),
+                   _group(5, category=1), {"id": 6, "country": "GB"},
+                   _group(7)]]}
+
+
+def _response(params):
+    pages = PAGES[(params["lon"], params["lat"])]
+    offset = params["offset"]
+    response = mock.Mock(text="...")
+    response.json.return_value = {
+        "results": pages[offset],
+        "meta": {"next": "" if offset == len(pages) - 1 else "next-url"}
+    }
+    return response
+
+
+def _country_groups():
+    return MeetupCountryGroups(country_code="gb", coords=list(PAGES),
+                               radius=10, category=34)
+
+
+@mock.patch(f"{PATCH_PREFIX}.meetup_utils.get_api_key", return_value="key")
+@mock.patch(f"{PATCH_PREFIX}.requests.get")
+def test_get_groups_recursive(mocked_get, mocked_key):
+    # Make the first coordinate finish last
+    second_requested = threading.Event()
+    def get(url, params):
+        if (params["lon"], params["lat"]) == (0, 0):
+            second_requested.wait(timeout=5)
+        else:
+            second_requested.set()
+        return _response(params)
+    mocked_get.side_effect = get
+
+    mcg = _country_groups()
+    mcg.get_groups_recursive(n_workers=2)
+    # Every page is followed, duplicates and groups from other countries
+    # or categories are dropped, and the order of the coordinates is kept
+    assert [group["id"] for group in mcg.groups] == [1, 2, 3, 7]
+    assert mcg.ids == {1, 2, 3, 7}
+    assert mocked_get.call_count == 3
+
+
+@mock.patch(f"{PATCH_PREFIX}.time.sleep")
+@mock.patch(f"{PATCH_PREFIX}.meetup_utils.get_api_key", return_value="key")
+@mock.patch(f"{PATCH_PREFIX}.requests.get")
+def test_get_page_retries(mocked_get, mocked_key, mocked_sleep):
+    bad_status = mock.Mock()
+    bad_status.raise_for_status.side_effect = requests.exceptions.HTTPError
+    empty = mock.Mock(text="")
+    good = _response(dict(lon=1, lat=1, offset=0))
+    mocked_get.side_effect = [bad_status, empty, good]
+    data = _country_groups().get_page(lon=1, lat=1, offset=0)
+    assert data == good.json.return_value
+    assert mocked_sleep.call_count == 2
+
+
+@mock.patch(f"{PATCH_PREFIX}.time.sleep")
+@mock.patch(f"{PATCH_PREFIX}.meetup_utils.get_api_key", return_value="key")
+@mock.patch(f"{PATCH_PREFIX}.requests.get")
+def test_get_page_retries_are_bounded(mocked_get, mocked_key, mocked_sleep):
+    mocked_get.return_value = mock.Mock(text="")
+    with pytest.raises(requests.exceptions.RetryError):
+        _country_groups().get_page(lon=1, lat=1, offset=0)
+    assert mocked_get.call_count == MAX_RETRIES + 1
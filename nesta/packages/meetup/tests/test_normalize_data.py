@@ -0,0 +1,41 @@
+from nesta.packages.meetup.meetup_utils import flatten_data
+from nesta.packages.meetup.meetup_utils import normalize_data
+
+DATA = [{"id": 1, "lat": 51.5, "lon": 0, "members": 10,
+         "category": {"id": 34, "name": "Tech"}},
+        {"id": 2, "lat": 52.25, "lon": -0.5, "members": None,
+         "topics": [{"name": "python"}]}]
+KEYS = [("category", "id"), ("category", "name"), "id",
+        "lat", "lon", "members", "topics", "urlname"]
+COLUMNS = {"category_id", "category_name", "id", "lat", "lon",
+           "members", "topics", "urlname", "country"}
+
+
+def test_normalize_data_columns():
+    # Every row has the same columns, as required for bulk inserts
+    for row in normalize_data(DATA, KEYS, country="GB"):
+        assert set(row.keys()) == COLUMNS
+
+
+def test_normalize_data_values():
+    normalized = normalize_data(DATA, KEYS, country="GB", id=-1)
+    flattened = flatten_data(DATA, KEYS, country="GB")
+    assert len(normalized) == len(flattened)
+    for norm_row, flat_row in zip(normalized, flattened):
+        for k, v in norm_row.items():
+            assert v == flat_row.get(k)
+
+
+def test_normalize_data_types():
+    first, second = normalize_data(DATA, KEYS)
+    # Integers are not converted to float due to missing values
+    assert type(first["category_id"]) is int
+    assert type(first["members"]) is int
+    assert type(second["id"]) is int
+    assert type(second["lat"]) is float
+    # Mixed int and float values are not truncated
+    assert first["lon"] == 0
+    assert second["lon"] == -0.5
+    assert second["category_id"] is None
+    assert second["members"] is None
+    assert second["topics"] == [{"name": "python"}]